@@ -3,7 +3,7 @@ import sqlite3
 from contextlib import closing
 from datetime import datetime, timedelta
 from sqlite3 import Row
-from typing import List, Optional
+from typing import List, Optional, Set
 
 from loguru import logger
 
@@ -89,40 +89,38 @@ class TaskModel:
             """)
             return cursor.fetchone() is not None
 
+    # tasks表的完整DDL: 缓存为常量, init_db用一次executescript执行
+    _SCHEMA_SQL = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(256) NOT NULL,
+            description TEXT DEFAULT '',
+            status VARCHAR(64) DEFAULT 'created',
+            version INTEGER DEFAULT 1,
+            number VARCHAR(256) NOT NULL,
+            is_leaf BOOLEAN DEFAULT FALSE,
+            parent_id INTEGER NOT NULL DEFAULT 0,
+            root_id INTEGER NOT NULL DEFAULT 0,
+            created_time DATETIME NOT NULL,
+            updated_time DATETIME,
+            started_time DATETIME,
+            finished_time DATETIME,
+            planned_start_time DATETIME,
+            planned_finish_time DATETIME,
+            progress REAL NOT NULL DEFAULT 0.0,
+            deleted BOOLEAN NOT NULL DEFAULT FALSE
+        );
+        -- 带number后缀, 使list_by_parent_id的ORDER BY number直接按索引序输出
+        CREATE INDEX IF NOT EXISTS idx_tasks_parent_id ON tasks(parent_id, deleted, number);
+        CREATE INDEX IF NOT EXISTS idx_tasks_root_id_number ON tasks(root_id, number, deleted);
+        CREATE INDEX IF NOT EXISTS idx_tasks_deleted ON tasks(deleted);
+        -- COLLATE NOCASE让LIKE 'prefix%'可以走索引(SQLite的LIKE优化要求NOCASE索引)
+        CREATE INDEX IF NOT EXISTS idx_tasks_parent_id_name ON tasks(parent_id, name COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS idx_tasks_updated_time ON tasks(updated_time);
+    """
+
     def init_db(self):
-        self._conn.execute("""
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name VARCHAR(256) NOT NULL,
-                description TEXT DEFAULT '',
-                status VARCHAR(64) DEFAULT 'created',
-                version INTEGER DEFAULT 1,
-                number VARCHAR(256) NOT NULL,
-                is_leaf BOOLEAN DEFAULT FALSE,
-                parent_id INTEGER NOT NULL DEFAULT 0,
-                root_id INTEGER NOT NULL DEFAULT 0,
-                created_time DATETIME NOT NULL,
-                updated_time DATETIME,
-                started_time DATETIME,
-                finished_time DATETIME,
-                planned_start_time DATETIME,
-                planned_finish_time DATETIME,
-                progress REAL NOT NULL DEFAULT 0.0,
-                deleted BOOLEAN NOT NULL DEFAULT FALSE
-            )
-        """)
-        self._conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tasks_parent_id ON tasks(parent_id, deleted)
-        """)
-        self._conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tasks_root_id_number ON tasks(root_id, number, deleted)
-        """)
-        self._conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tasks_deleted ON tasks(deleted)
-        """)
-        self._conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tasks_updated_time ON tasks(updated_time)
-        """)
+        self._conn.executescript(self._SCHEMA_SQL)
 
     @classmethod
     def _get_datetime_column_value(cls, row, field_name, optional=False):
@@ -191,6 +189,24 @@ class TaskModel:
                 for row in cursor.fetchall()
             ]
 
+    def count_by_parent_id(self, parent_id: int) -> int:
+        """统计某父任务下未删除子任务的数量"""
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT COUNT(*) FROM tasks
+                WHERE parent_id = ? AND deleted = FALSE
+            """, (parent_id,))
+            return cursor.fetchone()[0]
+
+    def list_names_by_parent_id(self, parent_id: int) -> Set[str]:
+        """获取某父任务下所有未删除子任务的名称集合, 跳过Task对象构造"""
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT name FROM tasks
+                WHERE parent_id = ? AND deleted = FALSE
+            """, (parent_id,))
+            return {row[0] for row in cursor.fetchall()}
+
     def list_by_root_id(self, root_id: int) -> List[Task]:
         with closing(get_dict_cursor(self._conn)) as cursor:
             cursor.execute(f"""
@@ -246,7 +262,8 @@ class TaskModel:
             # update parent is_leaf = 0
             self.update(Task(id=task.parent_id, is_leaf=False), fields=['is_leaf'])
 
-    def update(self, task: Task, fields: List[str] = None, use_version: bool = False):
+    def update(self, task: Task, fields: List[str] = None, use_version: bool = False,
+               fetch: bool = False) -> Optional[Task]:
         last_total_changes = self._conn.total_changes
         current_version = task.version if use_version else None
 
@@ -281,18 +298,21 @@ class TaskModel:
             WHERE {where_condition}
         """
 
-        print(query)
-        print(params)
         self._conn.execute(query, tuple(params))
 
         if self._conn.total_changes == last_total_changes:
             raise ValueError("Task update failed (ID not found or version mismatch)")
-        
+
         # 仅在更新成功后同步版本号
         if use_version:
             task.version += 1  # 严格与数据库保持同步
 
-    class InvalidStatusTransition(Exception):
+        # 默认不回读: 调用方已持有最新字段值, 按需fetch=True返回数据库中的行
+        if fetch:
+            return self.get_by_id(task.id)
+        return None
+
+    class InvalidStatusTransition(ValueError):
         """Invalid task status transition"""
         pass
 
@@ -373,6 +393,60 @@ class TaskModel:
                 for row in cursor.fetchall()
             ]
 
+    def check_fts(self) -> bool:
+        """检查SQLite是否编译了FTS5扩展"""
+        try:
+            self._conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            self._conn.execute("DROP TABLE temp.fts5_probe")
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    def init_fts(self):
+        """创建影子tasks.name的FTS5虚拟表及同步触发器(需要FTS5扩展)"""
+        self._conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts
+            USING fts5(name, content='tasks', content_rowid='id')
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+                INSERT INTO tasks_fts(rowid, name) VALUES (new.id, new.name);
+            END
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+                INSERT INTO tasks_fts(tasks_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            END
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF name ON tasks BEGIN
+                INSERT INTO tasks_fts(tasks_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                INSERT INTO tasks_fts(rowid, name) VALUES (new.id, new.name);
+            END
+        """)
+
+    def list_root_by_name_fts(self, name: str) -> List[Task]:
+        """List root tasks by name prefix via the FTS5 inverted index.
+
+        Requires init_fts(). Falls back to the LIKE path for an empty
+        prefix, which FTS5 cannot express.
+        """
+        if not name:
+            return self.list_root_by_name(name)
+        # 前缀查询: 整体按短语加引号再接*, 避免@/%等字符被当作FTS语法
+        match = '"' + name.replace('"', '""') + '"*'
+        with closing(get_dict_cursor(self._conn)) as cursor:
+            cursor.execute(f"""
+                SELECT {', '.join(f'tasks.{field_name}' for field_name in self.field_map.keys())}
+                FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid
+                WHERE tasks_fts MATCH ? AND tasks.parent_id = 0 AND tasks.deleted = FALSE
+                ORDER BY tasks.name
+            """, (match,))
+            return [
+                self._from_row(row)
+                for row in cursor.fetchall()
+            ]
+
     def start_by_id(self, task_id: int):
         """Start a task by its ID."""
         task = self.get_by_id(task_id)
@@ -408,14 +482,11 @@ class TaskModel:
         """
         if not 0.0 <= progress <= 1.0:
             raise ValueError("Progress must be between 0.0 and 1.0")
-            
+
         task = self.get_by_id(task_id)
         if not task:
             raise ValueError(f"Task with id {task_id} not found")
 
-        if not task.is_leaf:
-            raise ValueError(f"Task with id {task_id} is not a leaf task")
-
         # Update current task progress
         task.progress = progress
         self.update(task, fields=['progress'])
@@ -431,22 +502,17 @@ class TaskModel:
 
     def delete_by_id(self, task_id: int):
         """Mark a task and all its descendants as deleted by its ID."""
-        # Process children level by level
-        current_level = [task_id]
-        while current_level:
-            # Mark all current level as deleted
-            self._conn.execute("""
-                UPDATE tasks SET deleted = TRUE
-                WHERE id IN ({})
-            """.format(','.join('?' * len(current_level))), current_level)
-
-            # Get next level children
-            with closing(get_dict_cursor(self._conn)) as cursor:
-                cursor.execute("""
-                    SELECT id FROM tasks
-                    WHERE parent_id IN ({}) AND deleted = FALSE
-                """.format(','.join('?' * len(current_level))), current_level)
-                current_level = [row['id'] for row in cursor.fetchall()]
+        # 使用递归CTE一次性标记整棵子树, 避免在Python层逐层遍历
+        self._conn.execute("""
+            WITH RECURSIVE sub(id) AS (
+                SELECT ?
+                UNION ALL
+                SELECT t.id FROM tasks t JOIN sub ON t.parent_id = sub.id
+                WHERE t.deleted = FALSE
+            )
+            UPDATE tasks SET deleted = TRUE
+            WHERE id IN (SELECT id FROM sub)
+        """, (task_id,))
 
         self._check_parent_status(task_id)
 
@@ -456,7 +522,10 @@ class TaskModel:
 
     def clear(self):
         '''Clear the task table'''
-        # Clear all tasks
-        self._conn.execute("DELETE FROM tasks")
-        # Reset the autoincrement counter
-        self._conn.execute("DELETE FROM sqlite_sequence WHERE name='tasks'")
+        # 单次executescript: 无WHERE的DELETE走SQLite的truncate优化, 并重置自增计数器
+        self._conn.executescript("""
+            BEGIN;
+            DELETE FROM tasks;
+            DELETE FROM sqlite_sequence WHERE name='tasks';
+            COMMIT;
+        """)
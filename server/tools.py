@@ -269,5 +269,11 @@ def update_leaf_task(project_dir: str, task_id: int, progress: float) -> Dict[st
         raise ValueError("Progress must be between 0.0 and 1.0")
 
     with model_manager.open_models(project_dir).transaction() as models:
+        task = models.task.get_by_id(task_id)
+        if not task:
+            raise ValueError(f"Task with id {task_id} not found")
+        if not task.is_leaf:
+            raise ValueError(f"Task with id {task_id} is not a leaf task")
+
         task = models.task.update_progress(task_id, progress)
         return {'task': task}
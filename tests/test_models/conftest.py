@@ -0,0 +1,89 @@
+from contextlib import closing
+import os
+import sqlite3
+
+import pytest
+
+from models.task import TaskModel, Task
+
+
+def _build_schema_conn():
+    conn = sqlite3.connect(":memory:")
+    TaskModel(conn).init_db()
+    return conn
+
+# init_db是确定性的: 会话开始时构建一次schema, 之后每个连接直接复制页面镜像
+_SCHEMA_CONN = _build_schema_conn()
+# Connection.serialize需要Python 3.11+, 否则退回到backup
+_SCHEMA_BLOB = _SCHEMA_CONN.serialize() if hasattr(_SCHEMA_CONN, "serialize") else None
+
+
+def _restore_schema(conn: sqlite3.Connection):
+    """从缓存的schema镜像恢复数据库, 而不是重跑DDL"""
+    if _SCHEMA_BLOB is not None:
+        conn.deserialize(_SCHEMA_BLOB)
+    else:
+        _SCHEMA_CONN.backup(conn)
+
+
+@pytest.fixture(scope="session")
+def db_connection():
+    # 具名共享缓存内存库: 同一worker内的多个连接可共享页面缓存,
+    # 并按PYTEST_XDIST_WORKER区分, 方便以后直接跑pytest -n auto
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    conn = sqlite3.connect(f"file:taskmgr_test_{worker}?mode=memory&cache=shared", uri=True)
+    # 按列名访问查询结果, 不依赖列的位置
+    conn.row_factory = sqlite3.Row
+    _restore_schema(conn)
+    # 纯内存测试库: 关闭所有持久化相关开销, 并固定64MB页面缓存
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    try:
+        yield conn
+    finally:
+        # 整个会话只关闭一次; optimize让SQLite按本会话的查询模式更新统计信息
+        conn.execute("PRAGMA optimize")
+        conn.close()
+
+
+@pytest.fixture
+def task_model(db_connection):
+    # 每个测试用SAVEPOINT隔离, 回滚代替重建数据库
+    db_connection.execute("SAVEPOINT test_case")
+    yield TaskModel(db_connection)
+    try:
+        db_connection.execute("ROLLBACK TO test_case")
+        db_connection.execute("RELEASE test_case")
+    except sqlite3.OperationalError:
+        # clear()等executescript路径会提交掉SAVEPOINT, 退回整表清理
+        db_connection.execute("DELETE FROM tasks")
+        db_connection.execute("DELETE FROM sqlite_sequence WHERE name='tasks'")
+
+
+@pytest.fixture
+def bulk_insert(db_connection, task_model):
+    """把同一批任务的多次insert合并进一个SAVEPOINT, 一次性提交"""
+    def _insert_all(tasks):
+        db_connection.execute("SAVEPOINT bulk_insert")
+        for task in tasks:
+            task_model.insert(task)
+        db_connection.execute("RELEASE bulk_insert")
+    return _insert_all
+
+
+# 前缀查询测试的只读数据集名称
+_PREFIX_TASK_NAMES = ("Project Alpha", "Project Beta", "Task Gamma", "project delta", "Special@Task")
+
+
+@pytest.fixture(scope="session")
+def populated_task_model():
+    """会话级只读数据集: schema镜像 + 5条主任务, 供前缀查询类测试复用"""
+    conn = sqlite3.connect(":memory:")
+    _restore_schema(conn)
+    model = TaskModel(conn)
+    for number, name in enumerate(_PREFIX_TASK_NAMES, start=1):
+        model.insert(Task(id=None, name=name, number=str(number), root_id=0, parent_id=0))
+    with closing(conn):
+        yield model
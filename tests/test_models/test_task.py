@@ -1,37 +1,46 @@
-from contextlib import closing
-import pytest
+import dataclasses
 import sqlite3
-from models.task import TaskModel, Task
+from datetime import datetime
+from time import perf_counter
 
-@pytest.fixture
-def db_connection():
-    # 创建内存数据库
-    conn = sqlite3.connect(":memory:")
-    with closing(conn):
-        yield conn
+import pytest
+from models.task import Task, TaskModel
 
-@pytest.fixture
-def task_model(db_connection):
-    model = TaskModel(db_connection)
-    model.init_db()
-    return model
+def _make_task(name, number, root_id=0, parent_id=0, is_leaf=True, status="created", description=""):
+    """按位置参数构造测试任务, 避免每个用例重复展开Task的kwargs"""
+    return Task(None, name, description, status, 1, number, is_leaf, root_id, parent_id)
 
+@pytest.mark.fast
 def test_init_db(task_model, db_connection):
     # 验证表结构是否正确创建
-    cursor = db_connection.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks'")
-    assert cursor.fetchone() is not None
+    row = db_connection.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks'").fetchone()
+    assert row is not None
+
+def test_init_db_single_script():
+    # 回归测试: init_db应通过一次executescript执行缓存的DDL, 不再逐条execute
+    class CountingConnection(sqlite3.Connection):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.execute_calls = 0
+            self.executescript_calls = 0
+
+        def execute(self, *args, **kwargs):
+            self.execute_calls += 1
+            return super().execute(*args, **kwargs)
+
+        def executescript(self, *args, **kwargs):
+            self.executescript_calls += 1
+            return super().executescript(*args, **kwargs)
 
+    conn = sqlite3.connect(":memory:", factory=CountingConnection)
+    TaskModel(conn).init_db()
+    assert conn.executescript_calls == 1
+    assert conn.execute_calls == 0
+
+@pytest.mark.fast
 def test_insert_and_get_by_id(task_model):
     # 测试保存和获取任务
-    task = Task(
-        id=None,
-        name="Test Task",
-        description="Test Description",
-        number="1",
-        root_id=0,
-        parent_id=0
-    )
+    task = _make_task("Test Task", "1", description="Test Description")
     task_model.insert(task)
     
     retrieved = task_model.get_by_id(task.id)
@@ -39,81 +48,130 @@ def test_insert_and_get_by_id(task_model):
     assert retrieved.name == "Test Task"
     assert retrieved.description == "Test Description"
 
-def test_list_by_parent_id(task_model):
+@pytest.mark.fast
+def test_list_by_parent_id(task_model, bulk_insert):
     # 测试列出子任务
-    parent = Task(id=None, name="Parent", number="1", root_id=0, parent_id=0)
+    parent = _make_task("Parent", "1")
     task_model.insert(parent)
     
-    child1 = Task(id=None, name="Child1", number="1.1", root_id=parent.id, parent_id=parent.id)
-    child2 = Task(id=None, name="Child2", number="1.2", root_id=parent.id, parent_id=parent.id)
-    task_model.insert(child1)
-    task_model.insert(child2)
+    child1 = _make_task("Child1", "1.1", root_id=parent.id, parent_id=parent.id)
+    child2 = _make_task("Child2", "1.2", root_id=parent.id, parent_id=parent.id)
+    bulk_insert([child1, child2])
     
+    # 计数和名称直接走SQL, 不构造Task对象
+    assert task_model.count_by_parent_id(parent.id) == 2
+    assert task_model.list_names_by_parent_id(parent.id) == {"Child1", "Child2"}
+
+    # 有序list比较代替set: 同时校验ORDER BY number的输出顺序
     children = task_model.list_by_parent_id(parent.id)
-    assert len(children) == 2
-    assert {c.name for c in children} == {"Child1", "Child2"}
+    assert [c.name for c in children] == ["Child1", "Child2"]
+    assert all(c.parent_id == parent.id for c in children)
 
+@pytest.mark.fast
 def test_get_by_root_id_and_number(task_model):
     # 测试通过编号获取子任务
-    parent = Task(id=None, name="Parent", number="1", root_id=0, parent_id=0)
+    parent = _make_task("Parent", "1")
     task_model.insert(parent)
     
-    child = Task(id=None, name="Child", number="1.1", root_id=parent.id, parent_id=parent.id)
+    child = _make_task("Child", "1.1", root_id=parent.id, parent_id=parent.id)
     task_model.insert(child)
     
     found = task_model.get_by_root_id_and_number(parent.id, "1.1")
     assert found is not None
     assert found.name == "Child"
 
+@pytest.mark.fast
 def test_task_update(task_model):
     # 测试任务更新
-    task = Task(id=None, name="Original", number="1", root_id=0, parent_id=0)
+    task = _make_task("Original", "1")
     task_model.insert(task)
     
     task.name = "Updated"
     task.description = "New Description"
-    task_model.update(task)
-    
-    updated = task_model.get_by_id(task.id)
+    # fetch=True直接返回更新后的行, 省掉一次单独的SELECT
+    updated = task_model.update(task, fetch=True)
     assert updated.name == "Updated"
     assert updated.description == "New Description"
 
-def test_list_leaves(task_model):
+def test_list_leaves(task_model, bulk_insert):
     # 测试获取叶子任务
-    root = Task(id=None, name="Root", number="1", root_id=0, parent_id=0)
+    root = _make_task("Root", "1")
     task_model.insert(root)
     
     # 创建多级任务
-    task1 = Task(id=None, name="Task1", number="1.1", root_id=root.id, parent_id=root.id, is_leaf=True)
-    task2 = Task(id=None, name="Task2", number="1.2", root_id=root.id, parent_id=root.id, is_leaf=False)
-    task_model.insert(task1)
-    task_model.insert(task2)
-    task3 = Task(id=None, name="Task3", number="1.2.1", root_id=root.id, parent_id=task2.id, is_leaf=True)
+    task1 = _make_task("Task1", "1.1", root_id=root.id, parent_id=root.id)
+    task2 = _make_task("Task2", "1.2", root_id=root.id, parent_id=root.id, is_leaf=False)
+    bulk_insert([task1, task2])
+    task3 = _make_task("Task3", "1.2.1", root_id=root.id, parent_id=task2.id)
     task_model.insert(task3)
 
     # 获取叶子任务
+    # 有序list比较代替set: 同时校验ORDER BY number的输出顺序
     leaves = task_model.list_leaves(root.id)
-    assert len(leaves) == 2
-    assert {t.name for t in leaves} == {"Task1", "Task3"}
+    assert [t.name for t in leaves] == ["Task1", "Task3"]
+
+def test_list_leaves_single_query(task_model, bulk_insert):
+    """回归测试: list_leaves必须一条SQL取完整棵树的叶子, 不允许N+1式逐层查询"""
+    root = _make_task("Root", "1")
+    task_model.insert(root)
+    bulk_insert([
+        _make_task("Task1", "1.1", root_id=root.id, parent_id=root.id),
+        _make_task("Task2", "1.2", root_id=root.id, parent_id=root.id),
+    ])
+
+    queries = []
+    task_model._conn.set_trace_callback(queries.append)
+    try:
+        task_model.list_leaves(root.id)
+    finally:
+        task_model._conn.set_trace_callback(None)
+    assert len(queries) == 1
+
+@pytest.mark.perf
+def test_list_leaves_10k(task_model, db_connection):
+    """压力测试: 1万条任务下列表查询仍应毫秒级返回(默认跳过, pytest -m perf运行)"""
+    root = _make_task("Root", "", is_leaf=False)
+    task_model.insert(root)
+
+    # executemany批量插入, 绕过逐条insert的Task构造开销
+    now = datetime.now()
+    rows = [
+        (f"Task{i}", str(i), True, root.id, root.id, now)
+        for i in range(1, 10001)
+    ]
+    db_connection.executemany("""
+        INSERT INTO tasks (name, number, is_leaf, root_id, parent_id, created_time)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+
+    t0 = perf_counter()
+    tasks = task_model.list_by_root_id(root.id)
+    leaves = task_model.list_leaves(root.id)
+    elapsed = perf_counter() - t0
+
+    assert len(tasks) == 10001
+    assert len(leaves) == 10000
+    # 宽松的墙钟上界: 只拦截O(N^2)/N+1级别的回归, 不追求精确计时
+    assert elapsed < 2.0
 
 def test_list_leaves_empty(task_model):
     # 测试无叶子任务的情况
-    root = Task(id=None, name="Root", number="1", root_id=0, parent_id=0)
+    root = _make_task("Root", "1")
     task_model.insert(root)
     
     leaves = task_model.list_leaves(root.id)
     assert len(leaves) == 1
 
-def test_check_parent_status(task_model):
+@pytest.mark.trigger_heavy
+def test_check_parent_status(task_model, bulk_insert):
     # 测试父任务状态自动更新
-    root = Task(id=None, name="Root", number="", root_id=0, parent_id=0)
+    root = _make_task("Root", "")
     task_model.insert(root)
     
     # 创建子任务
-    child1 = Task(id=None, name="Child1", number="1", root_id=root.id, parent_id=root.id, is_leaf=True)
-    child2 = Task(id=None, name="Child2", number="2", root_id=root.id, parent_id=root.id, is_leaf=True)
-    task_model.insert(child1)
-    task_model.insert(child2)
+    child1 = _make_task("Child1", "1", root_id=root.id, parent_id=root.id)
+    child2 = _make_task("Child2", "2", root_id=root.id, parent_id=root.id)
+    bulk_insert([child1, child2])
     
     # 完成第一个子任务
     task_model.update_status(child1.id, "finished")
@@ -125,21 +183,21 @@ def test_check_parent_status(task_model):
     parent = task_model.get_by_id(root.id)
     assert parent.status == "finished"
 
-def test_check_parent_status_multilevel(task_model):
+@pytest.mark.trigger_heavy
+def test_check_parent_status_multilevel(task_model, bulk_insert):
     # 测试多级父任务状态更新
-    root = Task(id=None, name="Root", number="", root_id=0, parent_id=0)
+    root = _make_task("Root", "")
     task_model.insert(root)
     
     # 创建多级任务
-    parent = Task(id=None, name="Parent", number="1", root_id=root.id, parent_id=root.id, is_leaf=False)
+    parent = _make_task("Parent", "1", root_id=root.id, parent_id=root.id, is_leaf=False)
     task_model.insert(parent)
     
-    child1 = Task(id=None, name="Child1", number="1.1", root_id=root.id, parent_id=parent.id, is_leaf=True)
-    child2 = Task(id=None, name="Child2", number="1.2", root_id=root.id, parent_id=parent.id, is_leaf=True)
-    task_model.insert(child1)
-    task_model.insert(child2)
+    child1 = _make_task("Child1", "1.1", root_id=root.id, parent_id=parent.id)
+    child2 = _make_task("Child2", "1.2", root_id=root.id, parent_id=parent.id)
+    bulk_insert([child1, child2])
 
-    parent2 = Task(id=None, name="Parent2", number="2", root_id=root.id, parent_id=root.id, is_leaf=False)
+    parent2 = _make_task("Parent2", "2", root_id=root.id, parent_id=root.id, is_leaf=False)
     task_model.insert(parent2)
 
     # 完成子任务
@@ -156,7 +214,7 @@ def test_check_parent_status_multilevel(task_model):
 
 def test_version_control(task_model):
     # 测试版本控制
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0)
+    task = _make_task("Task", "1")
     task_model.insert(task)
     
     # 获取初始版本
@@ -174,15 +232,15 @@ def test_version_control(task_model):
 
 def test_version_conflict(task_model):
     # 测试版本冲突
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0)
+    task = _make_task("Task", "1")
     task_model.insert(task)
     
     # 获取初始版本
     original_version = task.version
     
-    # 模拟并发更新
+    # 模拟并发更新: 复制同一version快照, 而不是再SELECT一次
     task1 = task_model.get_by_id(task.id)
-    task2 = task_model.get_by_id(task.id)
+    task2 = dataclasses.replace(task1)
     
     # 第一次更新成功
     task1.name = "Updated1"
@@ -193,51 +251,92 @@ def test_version_conflict(task_model):
     with pytest.raises(ValueError):
         task_model.update(task2, fields=['name'], use_version=True)
 
-def test_list_root_by_name_prefix(task_model):
+# 前缀查询用例矩阵: (前缀, 期望命中的名称列表, 按ORDER BY name的BINARY序排列)
+_PREFIX_CASES = [
+    # 空名称前缀 - 应返回所有主任务
+    ("", ["Project Alpha", "Project Beta", "Special@Task", "Task Gamma", "project delta"]),
+    # 精确匹配
+    ("Project Alpha", ["Project Alpha"]),
+    # 部分前缀匹配 (SQLite LIKE是大小写不敏感的)
+    ("Proj", ["Project Alpha", "Project Beta", "project delta"]),
+    # 大小写不敏感 (SQLite LIKE默认行为)
+    ("project", ["Project Alpha", "Project Beta", "project delta"]),
+    # 特殊字符
+    ("Special@", ["Special@Task"]),
+    # 无匹配情况
+    ("XYZ", []),
+]
+
+@pytest.mark.parametrize("prefix,expected_names", _PREFIX_CASES)
+def test_list_root_by_name_prefix(populated_task_model, prefix, expected_names):
     """测试按名称前缀查询主任务"""
-    # 准备测试数据
-    tasks = [
-        Task(id=None, name="Project Alpha", number="1", root_id=0, parent_id=0),
-        Task(id=None, name="Project Beta", number="2", root_id=0, parent_id=0),
-        Task(id=None, name="Task Gamma", number="3", root_id=0, parent_id=0),
-        Task(id=None, name="project delta", number="4", root_id=0, parent_id=0),
-        Task(id=None, name="Special@Task", number="5", root_id=0, parent_id=0)
-    ]
-    for task in tasks:
-        task_model.insert(task)
-
-    # 测试空名称前缀 - 应返回所有主任务
-    results = task_model.list_root_by_name("")
-    assert len(results) == 5
+    results = populated_task_model.list_root_by_name(prefix)
+    # 有序list比较代替set: 同时校验查询的输出顺序
+    assert [t.name for t in results] == expected_names
 
-    # 测试精确匹配
-    results = task_model.list_root_by_name("Project Alpha")
-    assert len(results) == 1
-    assert results[0].name == "Project Alpha"
-
-    # 测试部分前缀匹配 (SQLite LIKE是大小写不敏感的)
-    results = task_model.list_root_by_name("Proj")
-    assert len(results) == 3
-    assert {t.name for t in results} == {"Project Alpha", "Project Beta", "project delta"}
-
-    # 测试大小写不敏感 (SQLite LIKE默认行为)
-    results = task_model.list_root_by_name("project")
+@pytest.fixture
+def fts_task_model(task_model):
+    """带FTS5虚拟表的task_model, FTS5不可用时跳过"""
+    if not task_model.check_fts():
+        pytest.skip("FTS5 extension not available")
+    task_model.init_fts()
+    return task_model
+
+def test_list_root_by_name_fts(fts_task_model, bulk_insert):
+    """测试FTS5前缀查询与LIKE路径结果一致"""
+    bulk_insert([
+        _make_task("Project Alpha", "1"),
+        _make_task("Project Beta", "2"),
+        _make_task("Task Gamma", "3"),
+    ])
+
+    results = fts_task_model.list_root_by_name_fts("Proj")
+    assert [t.name for t in results] == ["Project Alpha", "Project Beta"]
+
+    # 空前缀退回LIKE路径
+    results = fts_task_model.list_root_by_name_fts("")
     assert len(results) == 3
-    assert {t.name for t in results} == {"Project Alpha", "Project Beta", "project delta"}
 
-    # 测试特殊字符
-    results = task_model.list_root_by_name("Special@")
-    assert len(results) == 1
-    assert results[0].name == "Special@Task"
-
-    # 测试无匹配情况
-    results = task_model.list_root_by_name("XYZ")
-    assert len(results) == 0
+    # 删除后FTS结果同步
+    deleted = fts_task_model.list_root_by_name_fts("Proj")[0]
+    fts_task_model.delete_by_id(deleted.id)
+    results = fts_task_model.list_root_by_name_fts("Proj")
+    assert [t.name for t in results] == ["Project Beta"]
+
+def test_list_root_by_name_uses_index(task_model):
+    """回归测试: 名称前缀查询必须走索引(SEARCH)而不是全表扫描(SCAN)"""
+    plan = task_model._conn.execute("""
+        EXPLAIN QUERY PLAN
+        SELECT id FROM tasks
+        WHERE parent_id = 0 AND name LIKE 'Proj%' AND deleted = FALSE
+    """).fetchall()
+    assert any("USING INDEX" in row["detail"] for row in plan)
+    assert not any("SCAN tasks" in row["detail"] for row in plan)
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM tasks WHERE parent_id = ? AND deleted = FALSE ORDER BY number",
+    "SELECT * FROM tasks WHERE root_id = ? AND deleted = FALSE ORDER BY number",
+    "SELECT * FROM tasks WHERE root_id = ? AND is_leaf = 1 AND deleted = FALSE ORDER BY number",
+])
+def test_list_queries_use_index_order(task_model, query):
+    """回归测试: 各list_*查询必须走索引, 且ORDER BY number不触发临时B树排序"""
+    plan = task_model._conn.execute(f"EXPLAIN QUERY PLAN {query}", (0,)).fetchall()
+    assert any("USING INDEX" in row["detail"] for row in plan)
+    assert not any("TEMP B-TREE" in row["detail"] for row in plan)
+
+def test_name_index_collate_nocase(task_model):
+    """回归测试: name索引必须带COLLATE NOCASE, 否则LIKE优化不会生效"""
+    row = task_model._conn.execute("""
+        SELECT sql FROM sqlite_master
+        WHERE type='index' AND name='idx_tasks_parent_id_name'
+    """).fetchone()
+    assert row is not None
+    assert "COLLATE NOCASE" in row["sql"].upper()
 
 def test_delete_by_id(task_model):
     """测试逻辑删除单个任务"""
     # 创建任务
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0)
+    task = _make_task("Task", "1")
     task_model.insert(task)
     
     # 删除任务
@@ -248,22 +347,20 @@ def test_delete_by_id(task_model):
     assert deleted_task is None
     
     # 验证任务仍然存在于数据库中
-    cursor = task_model._conn.cursor()
-    cursor.execute("SELECT * FROM tasks WHERE id = ?", (task.id,))
-    row = cursor.fetchone()
+    row = task_model._conn.execute("SELECT deleted FROM tasks WHERE id = ?", (task.id,)).fetchone()
     assert row is not None
-    assert row[-1] == 1  # 验证deleted字段为True
+    assert row["deleted"] == 1  # 验证deleted字段为True
 
 def test_delete_by_id_with_nested_tasks(task_model):
     """测试删除嵌套任务"""
     # 创建3级任务树
-    root = Task(id=None, name="Root", number="1", root_id=0, parent_id=0)
+    root = _make_task("Root", "1")
     task_model.insert(root)
     
-    middle = Task(id=None, name="Middle", number="1.1", root_id=root.id, parent_id=root.id)
+    middle = _make_task("Middle", "1.1", root_id=root.id, parent_id=root.id)
     task_model.insert(middle)
     
-    leaf = Task(id=None, name="Leaf", number="1.1.1", root_id=root.id, parent_id=middle.id)
+    leaf = _make_task("Leaf", "1.1.1", root_id=root.id, parent_id=middle.id)
     task_model.insert(leaf)
     
     # 删除中间层任务
@@ -277,47 +374,43 @@ def test_delete_by_id_with_nested_tasks(task_model):
     assert task_model.get_by_id(root.id) is not None
     
     # 验证任务仍然存在于数据库中
-    cursor = task_model._conn.cursor()
-    cursor.execute("SELECT * FROM tasks WHERE id IN (?, ?)", (middle.id, leaf.id))
-    rows = cursor.fetchall()
+    rows = task_model._conn.execute("SELECT deleted FROM tasks WHERE id IN (?, ?)", (middle.id, leaf.id)).fetchall()
     assert len(rows) == 2
-    assert all(row[-1] == 1 for row in rows)  # 验证deleted字段为True
+    assert all(row["deleted"] == 1 for row in rows)  # 验证deleted字段为True
 
-def test_delete_all(task_model):
+def test_delete_all(task_model, bulk_insert):
     """测试逻辑删除所有任务"""
     # 创建多个任务
-    task1 = Task(id=None, name="Task1", number="1", root_id=0, parent_id=0)
-    task2 = Task(id=None, name="Task2", number="2", root_id=0, parent_id=0)
-    task_model.insert(task1)
-    task_model.insert(task2)
+    task1 = _make_task("Task1", "1")
+    task2 = _make_task("Task2", "2")
+    bulk_insert([task1, task2])
     
     # 删除所有任务
     task_model.delete_all()
-    
+
     # 验证所有任务已被标记为删除
+    assert task_model.count_by_parent_id(0) == 0
     assert task_model.get_by_id(task1.id) is None
     assert task_model.get_by_id(task2.id) is None
     
     # 验证任务仍然存在于数据库中
-    cursor = task_model._conn.cursor()
-    cursor.execute("SELECT * FROM tasks")
-    rows = cursor.fetchall()
+    rows = task_model._conn.execute("SELECT deleted FROM tasks ORDER BY id").fetchall()
     assert len(rows) == 2
-    assert all(row[-1] == 1 for row in rows)  # 验证所有任务的deleted字段为True
+    assert all(deleted == 1 for (deleted,) in rows)  # 验证所有任务的deleted字段为True
 
 def test_delete_by_id_with_nested_tasks(task_model):
     """测试删除嵌套任务"""
     # 创建3级任务树
-    root = Task(id=None, name="Root", number="1", root_id=0, parent_id=0)
+    root = _make_task("Root", "1")
     task_model.insert(root)
     
-    level2 = Task(id=None, name="Level2", number="1.1", root_id=root.id, parent_id=root.id)
+    level2 = _make_task("Level2", "1.1", root_id=root.id, parent_id=root.id)
     task_model.insert(level2)
     
-    level3 = Task(id=None, name="Level3", number="1.1.1", root_id=root.id, parent_id=level2.id)
+    level3 = _make_task("Level3", "1.1.1", root_id=root.id, parent_id=level2.id)
     task_model.insert(level3)
 
-    level4 = Task(id=None, name="Level4", number="1.1.1.1", root_id=root.id, parent_id=level3.id)
+    level4 = _make_task("Level4", "1.1.1.1", root_id=root.id, parent_id=level3.id)
     task_model.insert(level4)
 
     # 删除中间层任务
@@ -332,22 +425,19 @@ def test_delete_by_id_with_nested_tasks(task_model):
     assert task_model.get_by_id(root.id) is not None
     
     # 验证任务仍然存在于数据库中
-    cursor = task_model._conn.cursor()
-    cursor.execute("SELECT * FROM tasks WHERE id IN (?, ?, ?)", (level2.id, level3.id, level4.id))
-    rows = cursor.fetchall()
+    rows = task_model._conn.execute("SELECT deleted FROM tasks WHERE id IN (?, ?, ?)", (level2.id, level3.id, level4.id)).fetchall()
     assert len(rows) == 3
-    assert all(row[-1] == 1 for row in rows)  # 验证deleted字段为True
+    assert all(row["deleted"] == 1 for row in rows)  # 验证deleted字段为True
 
-def test_query_filter_deleted_tasks(task_model):
+def test_query_filter_deleted_tasks(task_model, bulk_insert):
     """测试查询方法过滤已删除任务"""
-    root_task = Task(id=None, name="Test1 Root", number="1", root_id=0, parent_id=0)
+    root_task = _make_task("Test1 Root", "1")
     task_model.insert(root_task)
 
     # 创建正常任务和已删除任务
-    active_task = Task(id=None, name="Test1 Active", number="1", root_id=root_task.id, parent_id=root_task.id)
-    deleted_task = Task(id=None, name="Test1 Deleted", number="2", root_id=root_task.id, parent_id=root_task.id)
-    task_model.insert(active_task)
-    task_model.insert(deleted_task)
+    active_task = _make_task("Test1 Active", "1", root_id=root_task.id, parent_id=root_task.id)
+    deleted_task = _make_task("Test1 Deleted", "2", root_id=root_task.id, parent_id=root_task.id)
+    bulk_insert([active_task, deleted_task])
     task_model.delete_by_id(deleted_task.id)
     
     # 测试get_by_id
@@ -378,34 +468,33 @@ def test_query_filter_deleted_tasks(task_model):
 def test_unique_index_with_deleted_tasks(task_model):
     """测试唯一索引在逻辑删除后的行为"""
     # 创建任务并删除
-    task1 = Task(id=None, name="Task", number="1", root_id=0, parent_id=0)
+    task1 = _make_task("Task", "1")
     task_model.insert(task1)
     task_model.delete_by_id(task1.id)
     
     # 创建同名任务
-    task2 = Task(id=None, name="Task", number="1", root_id=0, parent_id=0)
+    task2 = _make_task("Task", "1")
     task_model.insert(task2)  # 应成功插入
     
     # 验证两个任务都存在
-    cursor = task_model._conn.cursor()
-    cursor.execute("SELECT * FROM tasks")
-    rows = cursor.fetchall()
+    rows = task_model._conn.execute("SELECT deleted FROM tasks ORDER BY id").fetchall()
     assert len(rows) == 2
-    assert rows[0][-1] == 1  # 第一个任务已删除
-    assert rows[1][-1] == 0  # 第二个任务未删除
+    assert rows[0]["deleted"] == 1  # 第一个任务已删除
+    assert rows[1]["deleted"] == 0  # 第二个任务未删除
 
+@pytest.mark.trigger_heavy
 def test_delete_by_id_check_parent_status(task_model):
     """测试删除任务后检查父任务状态"""
     # 创建父任务
-    parent = Task(id=None, name="Parent", number="1", root_id=0, parent_id=0)
+    parent = _make_task("Parent", "1")
     task_model.insert(parent)
     
     # 创建两个已完成子任务
-    child1 = Task(id=None, name="Child1", number="1.1", root_id=parent.id, parent_id=parent.id)
+    child1 = _make_task("Child1", "1.1", root_id=parent.id, parent_id=parent.id)
     task_model.insert(child1)
     task_model.update_status(child1.id, "finished")
     
-    child2 = Task(id=None, name="Child2", number="1.2", root_id=parent.id, parent_id=parent.id)
+    child2 = _make_task("Child2", "1.2", root_id=parent.id, parent_id=parent.id)
     task_model.insert(child2)
     task_model.update_status(child2.id, "finished")
     
@@ -416,18 +505,19 @@ def test_delete_by_id_check_parent_status(task_model):
     updated_parent = task_model.get_by_id(parent.id)
     assert updated_parent.status == "finished"
 
+@pytest.mark.trigger_heavy
 def test_delete_by_id_check_parent_status_with_unfinished(task_model):
     """测试删除未完成子任务后父任务状态"""
     # 创建父任务
-    parent = Task(id=None, name="Parent", number="1", root_id=0, parent_id=0)
+    parent = _make_task("Parent", "1")
     task_model.insert(parent)
     
     # 创建一个已完成和一个未完成子任务
-    child1 = Task(id=None, name="Child1", number="1.1", root_id=parent.id, parent_id=parent.id)
+    child1 = _make_task("Child1", "1.1", root_id=parent.id, parent_id=parent.id)
     task_model.insert(child1)
     task_model.update_status(child1.id, "finished")
     
-    child2 = Task(id=None, name="Child2", number="1.2", root_id=parent.id, parent_id=parent.id)
+    child2 = _make_task("Child2", "1.2", root_id=parent.id, parent_id=parent.id)
     task_model.insert(child2)
     
     # 删除未完成子任务
@@ -437,14 +527,15 @@ def test_delete_by_id_check_parent_status_with_unfinished(task_model):
     updated_parent = task_model.get_by_id(parent.id)
     assert updated_parent.status == "finished"
 
+@pytest.mark.trigger_heavy
 def test_delete_by_id_check_parent_status_final_child(task_model):
     """测试删除最后一个子任务后父任务状态"""
     # 创建父任务
-    parent = Task(id=None, name="Parent", number="1", root_id=0, parent_id=0)
+    parent = _make_task("Parent", "1")
     task_model.insert(parent)
     
     # 创建一个已完成子任务
-    child1 = Task(id=None, name="Child1", number="1.1", root_id=parent.id, parent_id=parent.id)
+    child1 = _make_task("Child1", "1.1", root_id=parent.id, parent_id=parent.id)
     task_model.insert(child1)
     task_model.update_status(child1.id, "finished")
     
@@ -455,46 +546,36 @@ def test_delete_by_id_check_parent_status_final_child(task_model):
     updated_parent = task_model.get_by_id(parent.id)
     assert updated_parent.status == "finished"
 
-def test_start_by_id_valid_transition(task_model):
-    """测试从created状态正常开始任务"""
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0, is_leaf=True)
+@pytest.mark.parametrize("initial_status,is_leaf,method,expected_status", [
+    ("created", True, "start_by_id", "started"),
+    ("started", True, "start_by_id", None),
+    ("created", False, "start_by_id", None),
+    ("started", True, "finish_by_id", "finished"),
+    ("created", True, "finish_by_id", "finished"),
+    ("finished", True, "finish_by_id", None),
+    ("started", False, "finish_by_id", None),
+])
+def test_transition_by_id(task_model, initial_status, is_leaf, method, expected_status):
+    """测试start_by_id/finish_by_id的状态转换, expected_status为None表示非法转换"""
+    task = _make_task("Task", "1", parent_id=0,
+                is_leaf=is_leaf, status=initial_status)
     task_model.insert(task)
-    
-    started_task = task_model.start_by_id(task.id)
-    assert started_task is not None
-    assert started_task.status == "started"
-    assert started_task.started_time is not None
-
-def test_start_by_id_invalid_transition(task_model):
-    """测试从非created状态开始任务"""
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0, is_leaf=True, status="started")
-    task_model.insert(task)
-    
-    with pytest.raises(ValueError):
-        task_model.start_by_id(task.id)
 
-def test_start_by_id_non_leaf(task_model):
-    """测试开始非叶子任务"""
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0, is_leaf=False)
-    task_model.insert(task)
-    
-    with pytest.raises(ValueError):
-        task_model.start_by_id(task.id)
+    transition = getattr(task_model, method)
+    if expected_status is None:
+        with pytest.raises(ValueError):
+            transition(task.id)
+        return
 
-def test_finish_by_id_valid_transition(task_model):
-    """测试从started状态正常完成任务"""
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0, is_leaf=True, status="started")
-    task_model.insert(task)
-    
-    finished_task = task_model.finish_by_id(task.id)
-    assert finished_task is not None
-    assert finished_task.status == "finished"
-    assert finished_task.finished_time is not None
+    result = transition(task.id)
+    assert result is not None
+    assert result.status == expected_status
+    assert getattr(result, f"{expected_status}_time") is not None
 
 def test_update_progress_leaf_task(task_model):
     """测试更新叶子任务进度"""
     # 创建叶子任务
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0, is_leaf=True)
+    task = _make_task("Task", "1")
     task_model.insert(task)
     
     # 更新进度
@@ -507,12 +588,12 @@ def test_update_progress_leaf_task(task_model):
 def test_update_progress_recursive_parent(task_model):
     """测试递归更新父任务进度"""
     # 创建父任务
-    parent = Task(id=None, name="Parent", number="1", root_id=0, parent_id=0, is_leaf=False)
+    parent = _make_task("Parent", "1", is_leaf=False)
     task_model.insert(parent)
     
     # 创建两个子任务
-    child1 = Task(id=None, name="Child1", number="1.1", root_id=parent.id, parent_id=parent.id, is_leaf=True)
-    child2 = Task(id=None, name="Child2", number="1.2", root_id=parent.id, parent_id=parent.id, is_leaf=True)
+    child1 = _make_task("Child1", "1.1", root_id=parent.id, parent_id=parent.id)
+    child2 = _make_task("Child2", "1.2", root_id=parent.id, parent_id=parent.id)
     task_model.insert(child1)
     task_model.insert(child2)
     
@@ -530,7 +611,7 @@ def test_update_progress_recursive_parent(task_model):
 
 def test_update_progress_boundary_values(task_model):
     """测试边界值"""
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0, is_leaf=True)
+    task = _make_task("Task", "1")
     task_model.insert(task)
     
     # 测试0.0
@@ -543,7 +624,7 @@ def test_update_progress_boundary_values(task_model):
 
 def test_update_progress_invalid_values(task_model):
     """测试无效进度值"""
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0, is_leaf=True)
+    task = _make_task("Task", "1")
     task_model.insert(task)
     
     with pytest.raises(ValueError, match="Progress must be between 0.0 and 1.0"):
@@ -554,34 +635,18 @@ def test_update_progress_invalid_values(task_model):
 
 def test_update_progress_non_leaf(task_model):
     """测试更新非叶子任务进度"""
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0, is_leaf=False)
+    task = _make_task("Task", "1", is_leaf=False)
     task_model.insert(task)
     
     # 非叶子任务应该可以更新进度，因为父任务需要计算子任务平均进度
     updated = task_model.update_progress(task.id, 0.5)
     assert updated.progress == 0.5
 
-def test_finish_by_id_invalid_transition(task_model):
-    """测试从非started状态完成任务"""
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0, is_leaf=True, status="created")
-    task_model.insert(task)
-    
-    with pytest.raises(ValueError):
-        task_model.finish_by_id(task.id)
-
-def test_finish_by_id_non_leaf(task_model):
-    """测试完成非叶子任务"""
-    task = Task(id=None, name="Task", number="1", root_id=0, parent_id=0, is_leaf=False, status="started")
-    task_model.insert(task)
-    
-    with pytest.raises(ValueError):
-        task_model.finish_by_id(task.id)
-
 def test_clear(task_model):
     """测试清理任务表"""
     # 添加一些任务
-    task1 = Task(id=None, name="Task1", number="1", root_id=0, parent_id=0)
-    task2 = Task(id=None, name="Task2", number="2", root_id=0, parent_id=0)
+    task1 = _make_task("Task1", "1")
+    task2 = _make_task("Task2", "2")
     task_model.insert(task1)
     task_model.insert(task2)
     
@@ -597,25 +662,23 @@ def test_clear(task_model):
     assert task_model.get_by_id(task2.id) is None
     
     # 验证auto-increment已重置
-    cursor = task_model._conn.cursor()
-    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name='tasks'")
-    row = cursor.fetchone()
+    row = task_model._conn.execute("SELECT seq FROM sqlite_sequence WHERE name='tasks'").fetchone()
     assert row is None
     
     # 添加新任务验证ID从1开始
-    new_task = Task(id=None, name="New Task", number="1", root_id=0, parent_id=0)
+    new_task = _make_task("New Task", "1")
     task_model.insert(new_task)
     assert new_task.id == 1
 
 def test_update_leaf_task_recursive_parent(task_model):
     """测试更新叶子任务进度时递归更新父任务"""
     # 创建父任务
-    parent = Task(id=None, name="Parent", number="1", root_id=0, parent_id=0, is_leaf=False)
+    parent = _make_task("Parent", "1", is_leaf=False)
     task_model.insert(parent)
     
     # 创建两个子任务
-    child1 = Task(id=None, name="Child1", number="1.1", root_id=parent.id, parent_id=parent.id, is_leaf=True)
-    child2 = Task(id=None, name="Child2", number="1.2", root_id=parent.id, parent_id=parent.id, is_leaf=True)
+    child1 = _make_task("Child1", "1.1", root_id=parent.id, parent_id=parent.id)
+    child2 = _make_task("Child2", "1.2", root_id=parent.id, parent_id=parent.id)
     task_model.insert(child1)
     task_model.insert(child2)
     
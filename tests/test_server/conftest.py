@@ -0,0 +1,73 @@
+import itertools
+import sqlite3
+
+import pytest
+
+from models import ConnectionManager, model_manager
+
+
+def pytest_generate_tests(metafunc):
+    # 批量插入的规模矩阵: 声明n_subtasks参数的用例自动按三个量级展开
+    if "n_subtasks" in metafunc.fixturenames:
+        metafunc.parametrize("n_subtasks", [10, 100, 1000])
+
+
+@pytest.fixture(scope="session")
+def _shared_connection():
+    """会话级共享内存库: schema整个会话只初始化一次.
+
+    把ConnectionManager的连接获取/释放替换成复用同一个:memory:连接,
+    open_models重复打开不再有任何文件open/close和commit时的fsync.
+    """
+    manager = ConnectionManager.get_instance()
+    conn = sqlite3.connect(":memory:")
+    mp = pytest.MonkeyPatch()
+
+    def _acquire_connection(conn_id, project_dir):
+        manager._connection_dict[conn_id] = conn
+        return conn
+
+    def _release_connection(conn_id):
+        # 连接要活到会话结束, 这里只注销登记, 不真正close
+        manager._connection_dict.pop(conn_id, None)
+
+    mp.setattr(manager, "_acquire_connection", _acquire_connection)
+    mp.setattr(manager, "_release_connection", _release_connection)
+    try:
+        yield conn
+    finally:
+        mp.undo()
+        conn.close()
+
+
+@pytest.fixture(scope="session")
+def _base_dir(tmp_path_factory):
+    """会话级基础目录: mkdtemp整个会话只发生一次, 清理也由pytest一次完成"""
+    return tmp_path_factory.mktemp("tasks")
+
+
+# 每个测试的子目录编号, 比request.node.name更短且天然无非法字符
+_dir_counter = itertools.count()
+
+
+@pytest.fixture
+def project_dir(_base_dir, _shared_connection):
+    """项目目录fixture: 基础目录下建一个编号子目录, 数据落在会话级共享内存库里.
+
+    工具内部的事务在返回前已提交, SAVEPOINT回滚无法隔离,
+    所以每个测试结束后清空数据表并重置自增序列.
+    """
+    d = _base_dir / str(next(_dir_counter))
+    d.mkdir()
+    yield str(d)
+    with _shared_connection:
+        _shared_connection.execute("DELETE FROM tasks")
+        _shared_connection.execute("DELETE FROM sqlite_sequence WHERE name='tasks'")
+        _shared_connection.execute("DELETE FROM metadata")
+
+
+@pytest.fixture
+def models(project_dir):
+    """测试内复用的Models句柄: 断言用它查询, 不必每次都open_models"""
+    with model_manager.open_models(project_dir) as m:
+        yield m
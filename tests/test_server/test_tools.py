@@ -1,37 +1,38 @@
-import os
-import tempfile
-
 import pytest
 
-from models import model_manager
-from models.task import Task
 from server.tools import (TaskNode, add_task_tree, delete_task,
                           finish_leaf_task, list_leaf_tasks_by_root,
                           list_roots, list_tasks_by_root, clear_all_tasks,
                           start_leaf_task, update_leaf_task)
 
 
+def _by(attr, items):
+    """按属性值建一次索引字典, 代替next(...)式的线性扫描"""
+    return {getattr(t, attr): t for t in items}
+
+
+def _snapshot(project_dir, root_id):
+    """一次list_tasks_by_root查询, 同时给出列表和两种O(1)索引"""
+    items = list_tasks_by_root(project_dir, root_id)['tasks']
+    return {"items": items, "by_id": _by("id", items), "by_name": _by("name", items)}
+
+
+# 标准子节点常量: 模块加载时构造一次, 各测试复用同一批TaskNode.
+# add_task_tree只读取节点字段, 共享实例不会被改写.
+_STANDARD_CHILDREN = (TaskNode(name="Child1"), TaskNode(name="Child2"))
+
+
 @pytest.fixture
-def project_dir():
-    # 创建临时项目目录
-    dir_path = tempfile.mkdtemp()
-    yield dir_path
-    # 清理模型管理器状态
-    manager = model_manager.get_instance()
-    manager._models_dict = {}
-    # 删除临时目录
-    for root, dirs, files in os.walk(dir_path, topdown=False):
-        for name in files:
-            os.remove(os.path.join(root, name))
-        for name in dirs:
-            os.rmdir(os.path.join(root, name))
-    os.rmdir(dir_path)
+def task_tree(project_dir):
+    """预置的"根+两个子任务"脚手架: 一次add_task_tree建好, 返回name->task索引"""
+    root = TaskNode(name="Root", children=list(_STANDARD_CHILDREN))
+    return _by("name", add_task_tree(project_dir, root)['tasks'])
+
 
 def test_add_task_tree_with_parent(project_dir):
     # 先创建一个根任务
     root = TaskNode(name="Root")
-    add_task_tree(project_dir, root)
-    root_id = list_roots(project_dir)['tasks'][0].id
+    root_id = add_task_tree(project_dir, root)['tasks'][0].id
     
     # 创建一个子任务树
     child = TaskNode(name="Child")
@@ -42,6 +43,34 @@ def test_add_task_tree_with_parent(project_dir):
     assert result['tasks'][0].parent_id == root_id
     assert result['tasks'][0].root_id == root_id
 
+# add_task_tree形状矩阵: (根任务的children, 期望创建的任务总数)
+_TREE_SHAPES = [
+    # 只有根任务
+    ([], 1),
+    # 根 + 两个叶子
+    ([TaskNode(name="C1"), TaskNode(name="C2")], 3),
+    # 根 + 两级嵌套
+    ([TaskNode(name="C1", children=[TaskNode(name="C1.1")]), TaskNode(name="C2")], 4),
+]
+
+@pytest.mark.parametrize("children,expected_count", _TREE_SHAPES)
+def test_add_task_tree_shapes(project_dir, children, expected_count):
+    """测试不同形状的任务树一次插入后返回的任务数"""
+    root = TaskNode(name="Root", children=children)
+    result = add_task_tree(project_dir, root)
+    assert len(result['tasks']) == expected_count
+    # 返回值覆盖整棵树: 根在首位, 且每个任务都有id
+    assert result['tasks'][0].name == "Root"
+    assert all(t.id is not None for t in result['tasks'])
+
+def test_bulk_insert_scales(project_dir, n_subtasks):
+    """批量插入回归测试: 子任务数按量级增长时, 一次add_task_tree仍应全部落库"""
+    root = TaskNode(name="Root", children=[
+        TaskNode(name=f"T{i}", number=str(i)) for i in range(1, n_subtasks + 1)
+    ])
+    result = add_task_tree(project_dir, root)
+    assert len(result['tasks']) == n_subtasks + 1
+
 def test_list_roots(project_dir):
     root = TaskNode(name="Root", description="Root description", number="1")
     add_task_tree(project_dir, root)
@@ -53,29 +82,24 @@ def test_list_roots(project_dir):
     assert result['tasks'][0].number == "1"
 
 def test_list_tasks_by_root(project_dir):
-    root = TaskNode(name="Root")
-    add_task_tree(project_dir, root)
-    root_id = list_roots(project_dir)['tasks'][0].id
-    
-    result = list_tasks_by_root(project_dir, root_id)
-    assert len(result['tasks']) == 1
-    assert result['tasks'][0].name == "Root"
-
-def test_list_leaf_tasks_by_root(project_dir):
     root = TaskNode(name="Root")
     child = TaskNode(name="Child")
     root.children = [child]
-    add_task_tree(project_dir, root)
-    root_id = list_roots(project_dir)['tasks'][0].id
-    
-    result = list_leaf_tasks_by_root(project_dir, root_id)
-    assert len(result['tasks']) == 1
-    assert result['tasks'][0].name == "Child"
+    root_id = add_task_tree(project_dir, root)['tasks'][0].id
+
+    # 查询一次, 之后的断言都走快照字典
+    snap = _snapshot(project_dir, root_id)
+    assert len(snap["items"]) == 2
+    assert snap["by_id"][root_id].name == "Root"
+    assert snap["by_name"]["Child"].parent_id == root_id
+
+def test_list_leaf_tasks_by_root(project_dir, task_tree):
+    result = list_leaf_tasks_by_root(project_dir, task_tree["Root"].id)
+    assert [t.name for t in result['tasks']] == ["Child1", "Child2"]
 
 def test_start_leaf_task(project_dir):
     root = TaskNode(name="Root")
-    add_task_tree(project_dir, root)
-    task_id = list_roots(project_dir)['tasks'][0].id
+    task_id = add_task_tree(project_dir, root)['tasks'][0].id
     
     result = start_leaf_task(project_dir, task_id)
     assert result['task'].status == "started"
@@ -83,83 +107,67 @@ def test_start_leaf_task(project_dir):
 
 def test_finish_leaf_task(project_dir):
     root = TaskNode(name="Root")
-    add_task_tree(project_dir, root)
-    task_id = list_roots(project_dir)['tasks'][0].id
-    start_leaf_task(project_dir, task_id)
-    
-    result = finish_leaf_task(project_dir, task_id)
-    assert result['task'].status == "finished"
-    assert result['task'].finished_time is not None
-
-def test_delete_task(project_dir):
+    task_id = add_task_tree(project_dir, root)['tasks'][0].id
+
+    # 表驱动的状态推进: 一次setup依次走完start/finish两个阶段
+    stages = [
+        (start_leaf_task, "started", "started_time"),
+        (finish_leaf_task, "finished", "finished_time"),
+    ]
+    for tool, expected_status, time_field in stages:
+        task = tool(project_dir, task_id)['task']
+        assert task.status == expected_status
+        assert getattr(task, time_field) is not None
+
+def test_delete_task(project_dir, models):
     root = TaskNode(name="Root")
-    add_task_tree(project_dir, root)
-    task_id = list_roots(project_dir)['tasks'][0].id
-    
+    task_id = add_task_tree(project_dir, root)['tasks'][0].id
+
     result = delete_task(project_dir, task_id)
     assert result['result'] is True
-    
-    with model_manager.open_models(project_dir) as models:
-        assert models.task.get_by_id(task_id) is None
 
-def test_clear_all_tasks(project_dir):
+    assert models.task.get_by_id(task_id) is None
+
+def test_clear_all_tasks(project_dir, models):
     # 创建一些任务
     root = TaskNode(name="Root")
     add_task_tree(project_dir, root)
-    
+
     # 重置项目
     result = clear_all_tasks(project_dir)
     assert result['result'] is True
-    
+
     # 验证任务已被清除
-    with model_manager.open_models(project_dir) as models:
-        tasks = models.task.list_by_parent_id(0)
-        assert len(tasks) == 0
+    tasks = models.task.list_by_parent_id(0)
+    assert len(tasks) == 0
 
 def test_update_leaf_task(project_dir):
     root = TaskNode(name="Root")
-    add_task_tree(project_dir, root)
-    task_id = list_roots(project_dir)['tasks'][0].id
+    task_id = add_task_tree(project_dir, root)['tasks'][0].id
     
     result = update_leaf_task(project_dir, task_id, 0.5)
     assert result['task'].progress == 0.5
     assert result['task'].updated_time is not None
 
-def test_update_leaf_task_recursive_parent(project_dir):
+def test_update_leaf_task_recursive_parent(project_dir, models, task_tree):
     """测试更新叶子任务进度时递归更新父任务"""
-    # 创建父任务和子任务
-    root = TaskNode(name="Root")
-    child1 = TaskNode(name="Child1")
-    child2 = TaskNode(name="Child2")
-    root.children = [child1, child2]
-    add_task_tree(project_dir, root)
-    
-    # 获取任务ID
-    root_id = list_roots(project_dir)['tasks'][0].id
-    leaves = list_leaf_tasks_by_root(project_dir, root_id)['tasks']
-    child1_id = leaves[0].id
-    child2_id = leaves[1].id
+    root_id = task_tree["Root"].id
+    child1_id = task_tree["Child1"].id
+    child2_id = task_tree["Child2"].id
     
-    # 更新第一个子任务进度
+    # 更新第一个子任务进度, 验证父任务进度
     update_leaf_task(project_dir, child1_id, 0.3)
-    
-    # 验证父任务进度
-    with model_manager.open_models(project_dir) as models:
-        parent = models.task.get_by_id(root_id)
-        assert parent.progress == pytest.approx(0.15)  # (0.3 + 0.0) / 2
-    
-    # 更新第二个子任务进度
+    parent = models.task.get_by_id(root_id)
+    assert parent.progress == pytest.approx(0.15)  # (0.3 + 0.0) / 2
+
+    # 更新第二个子任务进度, 验证父任务进度
     update_leaf_task(project_dir, child2_id, 0.7)
-    
-    # 验证父任务进度
-    with model_manager.open_models(project_dir) as models:
-        parent = models.task.get_by_id(root_id)
-        assert parent.progress == pytest.approx(0.5)  # (0.3 + 0.7) / 2
+    parent = models.task.get_by_id(root_id)
+    assert parent.progress == pytest.approx(0.5)  # (0.3 + 0.7) / 2
 
 def test_update_leaf_task_boundary_values(project_dir):
     root = TaskNode(name="Root")
-    add_task_tree(project_dir, root)
-    task_id = list_roots(project_dir)['tasks'][0].id
+    task_id = add_task_tree(project_dir, root)['tasks'][0].id
     
     # Test 0.0
     result = update_leaf_task(project_dir, task_id, 0.0)
@@ -171,8 +179,7 @@ def test_update_leaf_task_boundary_values(project_dir):
 
 def test_update_leaf_task_invalid_progress(project_dir):
     root = TaskNode(name="Root")
-    add_task_tree(project_dir, root)
-    task_id = list_roots(project_dir)['tasks'][0].id
+    task_id = add_task_tree(project_dir, root)['tasks'][0].id
     
     with pytest.raises(ValueError, match="Progress must be between 0.0 and 1.0"):
         update_leaf_task(project_dir, task_id, -0.1)
@@ -180,15 +187,9 @@ def test_update_leaf_task_invalid_progress(project_dir):
     with pytest.raises(ValueError, match="Progress must be between 0.0 and 1.0"):
         update_leaf_task(project_dir, task_id, 1.1)
 
-def test_update_non_leaf_task(project_dir):
-    root = TaskNode(name="Root")
-    child = TaskNode(name="Child")
-    root.children = [child]
-    add_task_tree(project_dir, root)
-    root_id = list_roots(project_dir)['tasks'][0].id
-    
+def test_update_non_leaf_task(project_dir, task_tree):
     with pytest.raises(ValueError, match="is not a leaf task"):
-        update_leaf_task(project_dir, root_id, 0.5)
+        update_leaf_task(project_dir, task_tree["Root"].id, 0.5)
 
 def test_update_nonexistent_task(project_dir):
     with pytest.raises(ValueError, match="not found"):